@@ -1,22 +1,40 @@
 import argparse
+import functools
 import os
+import re
 import shutil
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
 from pathlib import Path
 
-from lib.archives import extract_archives_found_with_opts
-from lib.db_ops import finalize_gmail_identity, get_db_connection, init_db, save_identity
+from lib.archives import dedupe_archives, extract_archives_found_with_opts, find_archives
+from lib.db_ops import (
+    build_secondary_indexes,
+    drop_secondary_indexes,
+    finalize_gmail_identity,
+    get_db_connection,
+    init_db,
+    rebuild_fts,
+    save_identity,
+    suspend_fts_sync,
+)
 from parsers.facebook import (
     discover_facebook_identity,
     discover_instagram_identity,
     ingest_facebook_checkins,
-    ingest_facebook_entry,
     ingest_facebook_events,
     ingest_facebook_owned_events,
     ingest_facebook_posts,
-    ingest_instagram_entry,
+    parse_facebook_instagram_thread,
+    write_facebook_instagram_thread,
+)
+from parsers.google_chat import (
+    discover_google_chat_identity,
+    parse_google_chat_thread,
+    write_google_chat_thread,
 )
-from parsers.google_chat import discover_google_chat_identity, ingest_google_chat_thread
 from parsers.google_mail import ingest_google_mail_mbox
 from parsers.google_voice import discover_google_voice_identity, ingest_google_voice
 from utils import (
@@ -25,65 +43,111 @@ from utils import (
     clean_google_mail_files,
     clean_google_voice_files,
     clean_json_messages,
+    parse_ahead,
 )
 
 # --- Constants ---
 DB_NAME = "messagehub.db"
 
+# Commit once this many new rows are pending, or this many seconds after the last commit,
+# so huge threads don't build one giant transaction and tiny ones don't commit constantly
+COMMIT_EVERY_ROWS = 5000
+COMMIT_INTERVAL_S = 30
+
+# Drop the search/secondary indexes and rebuild them after the load only when the scan is
+# large relative to what is already stored; small incremental scans keep them live
+BULK_LOAD_RATIO = 0.1
+
+# Thread id prefixes of Facebook social activity (events, posts, check-ins)
+LEGACY_ACTIVITY_PREFIXES = ("fb_event_", "fb_post_", "fb_ci_")
+
+# Path keywords that identify a platform folder, in precedence order
+PLATFORM_MAP = {
+    "google chat": "google_chat",
+    "facebook": "facebook",
+    "messenger": "facebook",
+    "instagram": "instagram",
+}
+PLATFORM_RE = re.compile("|".join(map(re.escape, PLATFORM_MAP)))
+
+# A folder holding any of these is a message thread or identity folder
+SCAN_MARKER_FILES = frozenset(
+    ["message_1.json", "messages.json", "profile_information.json", "personal_information.json", "user_info.json"]
+)
+# Thread folders don't nest, so the scan doesn't descend below a folder holding one of these
+SCAN_THREAD_FILES = frozenset(["message_1.json", "messages.json"])
+# Attachment folders (and processed archives) never hold marker files, and exports bury
+# most of their files under them, so the scan doesn't descend into them (nor into hidden folders)
+SCAN_SKIP_DIRS = frozenset(
+    [
+        ".processed",
+        "photos",
+        "videos",
+        "gifs",
+        "audio",
+        "files",
+        "stickers_used",
+        "media",
+        "photos_and_videos",
+        "logged_information",
+    ]
+)
+
 
 # --- Platform Handlers ---
-def handle_google_voice(cursor, p_root, scan_path, discovered_identities):
+def handle_google_voice(cursor, p_root, scan_path, discovered_identities, parse_pool):
     if "google_voice" not in discovered_identities:
         gv_name = discover_google_voice_identity(scan_path)
         if gv_name:
             print(f"[Identity]: Discovered Google Voice number as {gv_name}")
             save_identity(cursor, "google_voice", "name", gv_name, is_me=True)
-        discovered_identities.add("google_voice")
+        discovered_identities["google_voice"] = gv_name
     print(f"[Ingesting]: Google Voice - {p_root.name}")
-    return ingest_google_voice(cursor, p_root)
+    return ingest_google_voice(cursor, p_root, executor=parse_pool)
 
 
-def handle_google_chat(cursor, p_root, scan_path, discovered_identities):
+def handle_google_chat(cursor, p_root, scan_path, discovered_identities, thread):
     if "google_chat" not in discovered_identities:
         gc_name = discover_google_chat_identity(scan_path)
         if gc_name:
             print(f"[Identity]: Discovered Google Chat owner as {gc_name}")
             save_identity(cursor, "google_chat", "name", gc_name, is_me=True)
-        discovered_identities.add("google_chat")
+        discovered_identities["google_chat"] = gc_name
     print(f"[Ingesting]: Google Chat - {p_root.name}")
-    return ingest_google_chat_thread(cursor, p_root)
+    return write_google_chat_thread(cursor, thread)
 
 
-def handle_facebook(cursor, p_root, scan_path, discovered_identities):
+def handle_facebook(cursor, p_root, scan_path, discovered_identities, thread):
     if "facebook" not in discovered_identities:
         fb_name = discover_facebook_identity(scan_path)
         if fb_name:
             print(f"[Identity]: Discovered Facebook owner as {fb_name}")
             save_identity(cursor, "facebook", "name", fb_name, is_me=True)
-        discovered_identities.add("facebook")
+        discovered_identities["facebook"] = fb_name
 
     print(f"[Ingesting]: Facebook - {p_root.name}")
-    count, skipped = ingest_facebook_entry(cursor, p_root)
+    count, skipped = write_facebook_instagram_thread(cursor, thread)
 
     # Special activity ingestion (once per scan)
     facebook_workspace = scan_path / "Facebook"
     if facebook_workspace.exists() and "facebook_activity" not in discovered_identities:
         print("[Ingesting]: Facebook Social Activity (Events, Posts, Check-ins)...")
-        my_full_name = discover_facebook_identity(scan_path)
+        my_full_name = discovered_identities["facebook"]
 
         # Cleanup legacy hashed IDs to prevent "doubles"
         print("  Cleaning up legacy social activity records...")
-        for prefix in ["fb_event_", "fb_post_", "fb_ci_"]:
-            # Delete threads that follow the old pattern: prefix + timestamp + _ + hash
-            # New pattern is just prefix + timestamp
-            cursor.execute(f"SELECT id FROM threads WHERE id LIKE '{prefix}%' AND id GLOB '{prefix}*[0-9]_*'")
-            legacy_ids = [row[0] for row in cursor.fetchall()]
-            if legacy_ids:
-                placeholders = ",".join(["?"] * len(legacy_ids))
-                cursor.execute(f"DELETE FROM content WHERE thread_id IN ({placeholders})", legacy_ids)
-                cursor.execute(f"DELETE FROM threads WHERE id IN ({placeholders})", legacy_ids)
-                # Labels will cascade if foreign keys are active, but safe to do manually
-                cursor.execute(f"DELETE FROM thread_labels WHERE thread_id IN ({placeholders})", legacy_ids)
+        # Delete threads that follow the old pattern: prefix + timestamp + _ + hash
+        # New pattern is just prefix + timestamp
+        # All prefixes are matched in one query, and the deletes run as one batch per table
+        where = " OR ".join(["(id LIKE ? AND id GLOB ?)"] * len(LEGACY_ACTIVITY_PREFIXES))
+        params = [p for prefix in LEGACY_ACTIVITY_PREFIXES for p in (f"{prefix}%", f"{prefix}*[0-9]_*")]
+        cursor.execute(f"SELECT id FROM threads WHERE {where}", params)
+        legacy_ids = [(row[0],) for row in cursor.fetchall()]
+        if legacy_ids:
+            cursor.executemany("DELETE FROM content WHERE thread_id = ?", legacy_ids)
+            cursor.executemany("DELETE FROM threads WHERE id = ?", legacy_ids)
+            # Labels will cascade if foreign keys are active, but safe to do manually
+            cursor.executemany("DELETE FROM thread_labels WHERE thread_id = ?", legacy_ids)
 
         ec, es = ingest_facebook_events(cursor, scan_path, my_full_name)
         oc, os = ingest_facebook_owned_events(cursor, scan_path, my_full_name)
@@ -92,20 +156,20 @@ def handle_facebook(cursor, p_root, scan_path, discovered_identities):
 
         count += ec + oc + pc + cc
         skipped += es + os + ps + cs
-        discovered_identities.add("facebook_activity")
+        discovered_identities["facebook_activity"] = True
 
     return count, skipped
 
 
-def handle_instagram(cursor, p_root, scan_path, discovered_identities):
+def handle_instagram(cursor, p_root, scan_path, discovered_identities, thread):
     if "instagram" not in discovered_identities:
         ig_name = discover_instagram_identity(scan_path)
         if ig_name:
             print(f"[Identity]: Discovered Instagram owner as {ig_name}")
             save_identity(cursor, "instagram", "name", ig_name, is_me=True)
-        discovered_identities.add("instagram")
+        discovered_identities["instagram"] = ig_name
     print(f"[Ingesting]: Instagram - {p_root.name}")
-    return ingest_instagram_entry(cursor, p_root)
+    return write_facebook_instagram_thread(cursor, thread)
 
 
 def handle_google_mail(cursor, p_root, scan_path, discovered_identities, gmail_identity_stats):
@@ -120,12 +184,51 @@ PLATFORM_HANDLERS = {
     "instagram": handle_instagram,
 }
 
+# Platforms whose thread folders are parsed in worker processes; their handlers receive the parsed thread
+THREAD_PARSERS = {
+    "google_chat": parse_google_chat_thread,
+    "facebook": functools.partial(parse_facebook_instagram_thread, platform="facebook"),
+    "instagram": functools.partial(parse_facebook_instagram_thread, platform="instagram"),
+}
+
 
 # --- Core Ingestion Logic ---
+def iter_marker_dirs(scan_path):
+    """
+    Yields every folder under scan_path (itself included) that holds one of SCAN_MARKER_FILES,
+    top-down like os.walk. Hidden folders, folders in SCAN_SKIP_DIRS and folders below a thread
+    are not entered, and each folder is read with a single scandir whose cached entry types
+    stand in for per-entry stat calls.
+    """
+    stack = [str(scan_path)]
+    while stack:
+        path = stack.pop()
+        subdirs = []
+        has_marker = is_thread = False
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    name = entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if name not in SCAN_SKIP_DIRS and not name.startswith("."):
+                            subdirs.append(entry.path)
+                    elif name in SCAN_MARKER_FILES:
+                        has_marker = True
+                        is_thread = is_thread or name in SCAN_THREAD_FILES
+        except OSError as e:
+            print(f"Warning: Could not scan {path}: {e}")
+            continue
+
+        if has_marker:
+            yield path
+        if not is_thread:
+            # Reversed so folders are popped in listing order
+            stack.extend(reversed(subdirs))
+
+
 def scan_directory(scan_path, db_path, platform_filter="all", limit_platforms=None):
     """Recursively scans the provided directory for chat export data."""
     conn = get_db_connection(db_path)
-    conn.execute("PRAGMA journal_mode=WAL;")
     cursor = conn.cursor()
 
     scan_path = Path(scan_path)
@@ -151,31 +254,13 @@ def scan_directory(scan_path, db_path, platform_filter="all", limit_platforms=No
                     files_to_process.append((10, mbox, "google_mail"))
 
     # 3. Recursive check for standard chat platforms
-    platform_map = {
-        "google chat": "google_chat",
-        "facebook": "facebook",
-        "messenger": "facebook",
-        "instagram": "instagram",
-    }
     priority_map = {"google_chat": 1, "facebook": 2, "instagram": 3}
 
-    for root, _, files in os.walk(scan_path):
-        # Look for message threads OR identity files
-        if not any(
-            f in files
-            for f in [
-                "message_1.json",
-                "messages.json",
-                "profile_information.json",
-                "personal_information.json",
-                "user_info.json",
-            ]
-        ):
-            continue
-
-        p_root = Path(root)
-        path_str = str(p_root).lower()
-        detected = next((v for k, v in platform_map.items() if k in path_str), None)
+    # Look for message threads OR identity files
+    for root in iter_marker_dirs(scan_path):
+        # One regex pass collects every keyword; PLATFORM_MAP order decides when several appear
+        found = set(PLATFORM_RE.findall(root.lower()))
+        detected = next((v for k, v in PLATFORM_MAP.items() if k in found), None)
 
         if not detected:
             continue
@@ -184,41 +269,87 @@ def scan_directory(scan_path, db_path, platform_filter="all", limit_platforms=No
         if limit_platforms is not None and detected not in limit_platforms:
             continue
 
-        files_to_process.append((priority_map.get(detected, 50), p_root, detected))
+        files_to_process.append((priority_map.get(detected, 50), Path(root), detected))
+
+    # Process platform by platform in priority order; the sort is stable, so folders keep scan order
+    files_to_process.sort(key=itemgetter(0))
+
+    # Building the indexes once over the loaded tables beats updating them row by row,
+    # unless the scan is small next to the data already stored
+    existing_threads = cursor.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+    bulk_load = len(files_to_process) >= existing_threads * BULK_LOAD_RATIO
+    if bulk_load:
+        suspend_fts_sync(conn)
+        drop_secondary_indexes(conn)
 
     # Ingestion Loop
     print(f"[TotalFiles]: {len(files_to_process)}")
     total_threads, total_msgs, total_skipped = 0, 0, 0
     processed_dirs = set()
     gmail_identity_stats = {}
-    discovered_identities = set()
-
-    for _, p_root, platform_type in files_to_process:
-        if p_root in processed_dirs:
-            continue
-
-        if platform_type == "google_mail":
-            count, skipped = handle_google_mail(cursor, p_root, scan_path, discovered_identities, gmail_identity_stats)
-        else:
-            handler = PLATFORM_HANDLERS.get(platform_type)
-            if handler:
-                count, skipped = handler(cursor, p_root, scan_path, discovered_identities)
-            else:
-                continue
-
-        if count > 0 or skipped > 0:
-            total_threads += 1
-            total_msgs += count
-            total_skipped += skipped
-            processed_dirs.add(p_root)
-            if total_threads % 10 == 0:
-                conn.commit()
-                print(f"  [Committed]: {total_threads} threads ({total_msgs} messages, {total_skipped} skipped)")
-
-    if gmail_identity_stats:
-        finalize_gmail_identity(cursor, gmail_identity_stats)
-
-    conn.commit()
+    # Platform -> owner name found for it (None if not found); each platform is discovered once per scan
+    discovered_identities = {}
+    rows_since_commit, last_commit = 0, time.monotonic()
+
+    # JSON decoding dominates thread ingestion, so it is spread across processes;
+    # this process stays the only SQLite writer.
+    parse_jobs = [(THREAD_PARSERS[p], p_root) for _, p_root, p in files_to_process if p in THREAD_PARSERS]
+    workers = os.cpu_count() or 1
+    if not any(p == "google_voice" for _, _, p in files_to_process):
+        workers = max(1, min(workers, len(parse_jobs)))
+
+    # Rows committed before a failure must still reach the search index: a smaller follow-up
+    # scan may not count as a bulk load and would never rebuild it
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as parse_pool:
+            parsed_threads = parse_ahead(parse_pool, parse_jobs)
+
+            for _, p_root, platform_type in files_to_process:
+                thread = next(parsed_threads) if platform_type in THREAD_PARSERS else None
+                if p_root in processed_dirs:
+                    continue
+
+                if platform_type == "google_mail":
+                    count, skipped = handle_google_mail(
+                        cursor, p_root, scan_path, discovered_identities, gmail_identity_stats
+                    )
+                elif platform_type in THREAD_PARSERS:
+                    count, skipped = PLATFORM_HANDLERS[platform_type](
+                        cursor, p_root, scan_path, discovered_identities, thread
+                    )
+                elif platform_type == "google_voice":
+                    # Voice splits its one root into virtual threads and parses them on the same pool
+                    count, skipped = handle_google_voice(cursor, p_root, scan_path, discovered_identities, parse_pool)
+                else:
+                    continue
+
+                if count > 0 or skipped > 0:
+                    total_threads += 1
+                    total_msgs += count
+                    total_skipped += skipped
+                    processed_dirs.add(p_root)
+                    rows_since_commit += count
+                    if rows_since_commit >= COMMIT_EVERY_ROWS or time.monotonic() - last_commit >= COMMIT_INTERVAL_S:
+                        conn.commit()
+                        rows_since_commit, last_commit = 0, time.monotonic()
+                        print(
+                            f"  [Committed]: {total_threads} threads ({total_msgs} messages, {total_skipped} skipped)"
+                        )
+
+        if gmail_identity_stats:
+            finalize_gmail_identity(cursor, gmail_identity_stats)
+
+        conn.commit()
+    finally:
+        if bulk_load:
+            # Drops whatever a failed scan left uncommitted (a no-op after the commit above)
+            conn.rollback()
+            print("Rebuilding search index...")
+            rebuild_fts(conn)
+            build_secondary_indexes(conn)
+            conn.commit()
+
+    conn.execute("PRAGMA optimize;")
     conn.close()
     print(f"Done! Processed {total_threads} threads and {total_msgs} messages.")
 
@@ -249,9 +380,9 @@ def start_ingestion():
     all_archives = []
     for loc in scan_locations:
         if loc.exists():
-            all_archives.extend(list(loc.glob("*.zip")) + list(loc.glob("*.tgz")) + list(loc.glob("*.tar.gz")))
+            all_archives.extend(find_archives(loc))
 
-    unique_archives = list({a.resolve() for a in all_archives})
+    unique_archives = dedupe_archives(all_archives)
     print(f"[TotalArchives]: {len(unique_archives)}")
 
     if unique_archives:
@@ -262,7 +393,7 @@ def start_ingestion():
             sys.exit(1)
 
     processed_count, detected_platforms, archive_moves = extract_archives_found_with_opts(
-        scan_locations, WORKSPACE_PATH, args.platform, args.delete_archives
+        scan_locations, WORKSPACE_PATH, args.platform, args.delete_archives, precomputed_archives=unique_archives
     )
 
     # Execution
@@ -1,14 +1,322 @@
 import os
 import shutil
 import tarfile
-import threading
 import time
 import zipfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 from utils import merge_folders
 
+# Optional accelerators (fall back to the stdlib when missing)
+try:
+    from isal import igzip
+except ImportError:
+    igzip = None
+
+try:
+    import rapidgzip
+except ImportError:
+    rapidgzip = None
+
+ARCHIVE_SUFFIXES = (".zip", ".tgz", ".tar.gz")
+
+# Members handed to each extractall() call; progress is reported between chunks
+EXTRACT_CHUNK_SIZE = 500
+
+# Takeout products that live at the workspace root: (platform, folder, label)
+TAKEOUT_PRODUCTS = (
+    ("google_voice", "Voice", "Google Voice"),
+    ("google_chat", "Google Chat", "Google Chat"),
+    ("google_mail", "Mail", "Google Mail"),
+)
+
+# Copy buffer for tar members (tarfile defaults to 16 KiB, i.e. 64 read/write rounds per MiB)
+TAR_COPY_BUFSIZE = 1 << 20
+
+
+def find_archives(directory):
+    """Lists the .zip/.tgz/.tar.gz files directly inside directory in a single scandir pass."""
+    with os.scandir(directory) as it:
+        return [Path(e.path) for e in it if e.name.endswith(ARCHIVE_SUFFIXES) and e.is_file()]
+
+
+def dedupe_archives(archives):
+    """
+    Drops paths that point at an archive already listed (repeated search dirs, symlinks).
+    Files are keyed by (st_dev, st_ino): one stat per path instead of resolve()'s per-component lstats.
+    """
+    seen = set()
+    unique = []
+    for a in archives:
+        st = os.stat(a)
+        key = (st.st_dev, st.st_ino)
+        if key not in seen:
+            seen.add(key)
+            unique.append(a)
+    return unique
+
+
+class StreamTarFile(tarfile.TarFile):
+    """A TarFile over a decompressed stream it owns: close() closes the stream too, as "r:gz" does."""
+
+    stream = None
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+
+
+def tar_gz_seeks_cheaply(decode_threads=1):
+    """True when open_tar_gz will use rapidgzip, whose block index makes backward seeks cheap."""
+    return rapidgzip is not None and decode_threads > 1
+
+
+def open_tar_gz(archive_path, decode_threads=1, seekable=False):
+    """
+    Opens a .tar.gz/.tgz for reading. With more than one decode thread and rapidgzip installed,
+    deflate blocks are inflated in parallel; otherwise ISA-L (python-isal) is used when installed.
+    ISA-L streams can only be read forwards, so pass seekable=True when the caller may seek back.
+    """
+    if tar_gz_seeks_cheaply(decode_threads):
+        fileobj = rapidgzip.open(str(archive_path), parallelization=decode_threads)
+    elif igzip is not None and not seekable:
+        fileobj = igzip.open(archive_path, "rb")
+    else:
+        return tarfile.open(archive_path, "r:gz", copybufsize=TAR_COPY_BUFSIZE)
+
+    try:
+        archive_obj = StreamTarFile.open(fileobj=fileobj, mode="r:", copybufsize=TAR_COPY_BUFSIZE)
+    except Exception:
+        fileobj.close()
+        raise
+    archive_obj.stream = fileobj
+    return archive_obj
+
+
+def process_archive(archive_path, target_root, platform_filter="all", decode_threads=1):
+    """
+    Worker function to extract a single archive; runs in its own process.
+    decode_threads: cores this archive may use to inflate a .tar.gz (see open_tar_gz)
+    Returns (success_bool, detected_platform_set); success is False when any member failed to
+    extract, in which case the platforms are still returned but the archive must not be retired.
+    """
+    local_detected = set()
+    is_zip = archive_path.suffix == ".zip"
+    is_tar = archive_path.name.endswith(".tar.gz") or archive_path.name.endswith(".tgz")
+
+    try:
+        file_list = []
+
+        # Open Archive (the listing is read once and reused for detection and extraction;
+        # for tar it means decompressing the whole header stream)
+        if is_zip:
+            archive_obj = zipfile.ZipFile(archive_path, "r")
+            members = archive_obj.infolist()
+            file_list = [m.filename for m in members]
+        elif is_tar:
+            archive_obj = open_tar_gz(archive_path, decode_threads)
+            members = archive_obj.getmembers()
+            # Links may need tarfile to look their target up again, which seeks backwards
+            tar_seekable = any(m.islnk() or m.issym() for m in members)
+            if not tar_gz_seeks_cheaply(decode_threads):
+                # Re-opened so extraction reads a fresh stream front to back instead of
+                # seeking backwards (a plain gzip rewind re-inflates from the start anyway)
+                archive_obj.close()
+                archive_obj = open_tar_gz(archive_path, decode_threads, tar_seekable)
+            file_list = [m.name for m in members]
+        else:
+            return False, None
+
+        # signatures (one pass over the listing; flags already found are not re-tested)
+        has_voice = has_chat = has_mail = is_insta = is_fb = False
+        for f in file_list:
+            if not has_voice and f.startswith("Takeout/Voice/"):
+                has_voice = True
+            elif not has_chat and f.startswith("Takeout/Google Chat/"):
+                has_chat = True
+            elif not has_mail and f.startswith("Takeout/Mail/"):
+                has_mail = True
+            if not is_insta and (f.startswith("your_instagram_activity") or "instagram_profile_information.json" in f):
+                is_insta = True
+            if not is_fb and (
+                f.startswith("your_facebook_activity") or "personal_information/profile_information/" in f
+            ):
+                is_fb = True
+            if has_voice and has_chat and has_mail and is_insta and is_fb:
+                break
+
+        # Filter Check
+        if platform_filter != "all":
+            allowed = False
+            if platform_filter == "google_voice" and has_voice:
+                allowed = True
+            if platform_filter == "google_chat" and has_chat:
+                allowed = True
+            if platform_filter == "google_mail" and has_mail:
+                allowed = True
+            if platform_filter == "instagram" and is_insta:
+                allowed = True
+            if platform_filter == "facebook" and is_fb:
+                allowed = True
+
+            if not allowed:
+                print(f"  Skipping {archive_path.name}: Filter mismatch.")
+                archive_obj.close()
+                return False, None
+
+        # Extract
+        dest_dir = target_root
+        if is_insta:
+            dest_dir = target_root / "Instagram"
+        if is_fb:
+            dest_dir = target_root / "Facebook"
+
+        # Identification Logging
+        if has_voice or has_chat or has_mail:
+            print(f"  [Thread] Extracting Google Takeout: {archive_path.name}")
+            if has_voice:
+                local_detected.add("google_voice")
+            if has_chat:
+                local_detected.add("google_chat")
+            if has_mail:
+                local_detected.add("google_mail")
+        elif is_insta:
+            print(f"  [Thread] Extracting Instagram: {archive_path.name}")
+            local_detected.add("instagram")
+        elif is_fb:
+            print(f"  [Thread] Extracting Facebook: {archive_path.name}")
+            local_detected.add("facebook")
+        else:
+            print(f"  Skipping {archive_path.name}: Unknown structure.")
+            archive_obj.close()
+            return False, None
+
+        # Takeout products are extracted straight to their final folders (Takeout/Voice/x -> Voice/x)
+        # instead of being extracted under Takeout/ and moved afterwards
+        if dest_dir == target_root:
+            flatten_takeout_members(members)
+
+        # Prepare destination directory (mkdir with exist_ok is safe across concurrent workers)
+        if dest_dir.is_file():
+            print(f"  [Error] Cannot extract to {dest_dir}: file already exists with this name.")
+            return False, None
+        dest_dir.mkdir(parents=True, exist_ok=True)
+
+        # Perform Extraction
+        total_members = len(members)
+        print(f"[ArchiveStarted]: {archive_path.name}|{total_members}")
+
+        dest_dir_real = os.path.realpath(dest_dir)
+        failed_members = 0
+
+        for start in range(0, total_members, EXTRACT_CHUNK_SIZE):
+            chunk = []
+            for member in members[start : start + EXTRACT_CHUNK_SIZE]:
+                # Security Check: Prevent Zip Slip (path traversal)
+                member_name = member.filename if is_zip else member.name
+                target_path = os.path.realpath(os.path.join(dest_dir_real, member_name))
+                if not target_path.startswith(dest_dir_real):
+                    print(f"  [Security] Skipping unsafe member (potential Zip Slip): {member_name}")
+                    continue
+                chunk.append(member)
+
+            try:
+                archive_obj.extractall(dest_dir, members=chunk)
+            except Exception:
+                # Retry one by one so a single bad member doesn't drop the rest of the chunk.
+                # The retry starts over at the chunk's first member; a forward-only tar stream
+                # is already past it, so read from a fresh one
+                if is_tar and not tar_gz_seeks_cheaply(decode_threads):
+                    archive_obj.close()
+                    archive_obj = open_tar_gz(archive_path, decode_threads, tar_seekable)
+                for member in chunk:
+                    try:
+                        archive_obj.extract(member, dest_dir)
+                    except Exception as e:
+                        failed_members += 1
+                        member_name = member.filename if is_zip else member.name
+                        print(f"  Warning: Failed to extract {member_name} from {archive_path.name}: {e}")
+
+            done = min(start + EXTRACT_CHUNK_SIZE, total_members)
+            print(f"[ArchiveProgress]: {archive_path.name}|{done}|{total_members}")
+
+        archive_obj.close()
+        print(f"[ArchiveExtracted]: {archive_path.name}")
+
+        if failed_members:
+            # What was extracted still gets ingested, but the archive is kept for another try
+            print(f"  Warning: {failed_members} members of {archive_path.name} failed to extract; keeping the archive.")
+            return False, local_detected
+        return True, local_detected
+
+    except Exception as e:
+        print(f"  Error processing {archive_path.name}: {e}")
+        return False, None
+
+
+def flatten_takeout_members(members):
+    """Renames Takeout/<product>/... members (ZipInfo or TarInfo) in place to <product>/..."""
+    prefixes = tuple(f"Takeout/{folder}" for _, folder, _ in TAKEOUT_PRODUCTS)
+    for member in members:
+        attr = "filename" if isinstance(member, zipfile.ZipInfo) else "name"
+        name = getattr(member, attr)
+        for prefix in prefixes:
+            if name.startswith(prefix) and name[len(prefix) : len(prefix) + 1] in ("", "/"):
+                setattr(member, attr, name[len("Takeout/") :])
+                break
+
+
+def drop_cached_pages(path):
+    """Asks the kernel to evict a file's pages from the page cache (no-op without posix_fadvise)."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def retire_archive(archive_path, target_root, delete_after=False):
+    """
+    Deletes an extracted archive or moves it into target_root/.processed.
+    Returns move_info: (original_Path, processed_Path_or_None), or None if nothing was moved.
+    """
+    try:
+        if delete_after:
+            archive_path.unlink()
+            print(f"  [Post] Deleted archive: {archive_path.name}")
+            return archive_path, None
+
+        processed_dir = target_root / ".processed"
+        os.makedirs(processed_dir, exist_ok=True)
+
+        destination = processed_dir / archive_path.name
+        if destination.exists():
+            timestamp = int(time.time() * 1000)
+            destination = processed_dir / f"{archive_path.stem}_{timestamp}{archive_path.suffix}"
+
+        # Double check archive still exists
+        if not archive_path.exists():
+            return None
+
+        shutil.move(str(archive_path), str(destination))
+        # The archive was just read end to end; don't let it crowd the extracted files and
+        # the database out of the page cache while they are ingested
+        drop_cached_pages(destination)
+        return archive_path, destination
+    except Exception as e:
+        print(f"  Warning: Move/Delete failed for {archive_path.name}: {e}")
+        return None
+
 
 def extract_archives_found(search_dirs, target_root, platform_filter="all"):
     """
@@ -20,218 +328,74 @@ def extract_archives_found(search_dirs, target_root, platform_filter="all"):
     return extract_archives_found_with_opts(search_dirs, target_root, platform_filter, False)
 
 
-def extract_archives_found_with_opts(search_dirs, target_root, platform_filter="all", delete_after=False):
+def extract_archives_found_with_opts(
+    search_dirs, target_root, platform_filter="all", delete_after=False, precomputed_archives=None
+):
     """
     Scans specified directories for .zip/.tar.gz files and extracts them
     into a subdirectory of target_root named after the zip file.
+    precomputed_archives: already discovered (deduplicated) archives; skips scanning search_dirs
     Returns: tuple (processed_count, set_of_platforms_detected, archive_moves)
     archive_moves: list of (original_Path, processed_Path_or_None)
     """
     processed = 0
     target_root = Path(target_root)
     archive_moves = []
-    extraction_lock = threading.Lock()
 
-    seen_zips = set()
     detected_platforms = set()
 
     # Collect all archives first
-    all_archives = []
-    for d in search_dirs:
-        d_path = Path(d)
-        if not d_path.exists():
-            continue
-        archives = list(d_path.glob("*.zip")) + list(d_path.glob("*.tgz")) + list(d_path.glob("*.tar.gz"))
-        for a in archives:
-            if a.resolve() not in seen_zips:
-                seen_zips.add(a.resolve())
-                all_archives.append(a)
+    if precomputed_archives is not None:
+        all_archives = list(precomputed_archives)
+    else:
+        all_archives = []
+        for d in search_dirs:
+            d_path = Path(d)
+            if d_path.exists():
+                all_archives.extend(find_archives(d_path))
+        all_archives = dedupe_archives(all_archives)
 
     if not all_archives:
         return 0, set(), []
 
-    def process_archive(archive_path):
-        """
-        Worker function to extract a single archive.
-        Returns (success_bool, detected_platform_set, move_info)
-        """
-        local_detected = set()
-        is_zip = archive_path.suffix == ".zip"
-        is_tar = archive_path.name.endswith(".tar.gz") or archive_path.name.endswith(".tgz")
-
-        try:
-            file_list = []
-
-            # Open Archive
-            if is_zip:
-                archive_obj = zipfile.ZipFile(archive_path, "r")
-                file_list = archive_obj.namelist()
-            elif is_tar:
-                archive_obj = tarfile.open(archive_path, "r:gz")
-                file_list = archive_obj.getnames()
-            else:
-                return False, None, None
-
-            # signatures
-            has_voice = any(f.startswith("Takeout/Voice/") for f in file_list)
-            has_chat = any(f.startswith("Takeout/Google Chat/") for f in file_list)
-            has_mail = any(f.startswith("Takeout/Mail/") for f in file_list)
-            is_insta = any(f.startswith("your_instagram_activity") for f in file_list) or any(
-                "instagram_profile_information.json" in f for f in file_list
-            )
-            is_fb = any(f.startswith("your_facebook_activity") for f in file_list) or any(
-                "personal_information/profile_information/" in f for f in file_list
-            )
-
-            # Filter Check
-            if platform_filter != "all":
-                allowed = False
-                if platform_filter == "google_voice" and has_voice:
-                    allowed = True
-                if platform_filter == "google_chat" and has_chat:
-                    allowed = True
-                if platform_filter == "google_mail" and has_mail:
-                    allowed = True
-                if platform_filter == "instagram" and is_insta:
-                    allowed = True
-                if platform_filter == "facebook" and is_fb:
-                    allowed = True
-
-                if not allowed:
-                    print(f"  Skipping {archive_path.name}: Filter mismatch.")
-                    archive_obj.close()
-                    return False, None, None
-
-            # Extract
-            dest_dir = target_root
-            if is_insta:
-                dest_dir = target_root / "Instagram"
-            if is_fb:
-                dest_dir = target_root / "Facebook"
-
-            # Identification Logging
-            if has_voice or has_chat or has_mail:
-                print(f"  [Thread] Extracting Google Takeout: {archive_path.name}")
-                if has_voice:
-                    local_detected.add("google_voice")
-                if has_chat:
-                    local_detected.add("google_chat")
-                if has_mail:
-                    local_detected.add("google_mail")
-            elif is_insta:
-                print(f"  [Thread] Extracting Instagram: {archive_path.name}")
-                local_detected.add("instagram")
-            elif is_fb:
-                print(f"  [Thread] Extracting Facebook: {archive_path.name}")
-                local_detected.add("facebook")
-            else:
-                print(f"  Skipping {archive_path.name}: Unknown structure.")
-                archive_obj.close()
-                return False, None, None
-
-            # Prepare destination directory (Locked)
-            with extraction_lock:
-                if not dest_dir.exists():
-                    dest_dir.mkdir(parents=True, exist_ok=True)
-                elif dest_dir.is_file():
-                    print(f"  [Error] Cannot extract to {dest_dir}: file already exists with this name.")
-                    return False, None, None
-
-            # Perform Extraction (Unlocked for Parallelism)
-            members = archive_obj.namelist() if is_zip else archive_obj.getmembers()
-            total_members = len(members)
-            print(f"[ArchiveStarted]: {archive_path.name}|{total_members}")
-
-            dest_dir_real = os.path.realpath(dest_dir)
-
-            for i, member in enumerate(members):
-                try:
-                    # Security Check: Prevent Zip Slip (path traversal)
-                    member_name = member if is_zip else member.name
-                    target_path = os.path.realpath(os.path.join(dest_dir_real, member_name))
-                    if not target_path.startswith(dest_dir_real):
-                        print(f"  [Security] Skipping unsafe member (potential Zip Slip): {member_name}")
-                        continue
-
-                    archive_obj.extract(member, dest_dir)
-                    if (i + 1) % 50 == 0 or (i + 1) == total_members:
-                        print(f"[ArchiveProgress]: {archive_path.name}|{i + 1}|{total_members}")
-                except Exception as e:
-                    member_name = member if is_zip else member.name
-                    print(f"  Warning: Failed to extract {member_name} from {archive_path.name}: {e}")
-
-            archive_obj.close()
-            print(f"[ArchiveExtracted]: {archive_path.name}")
+    # Largest first, so a big archive doesn't start last and leave the other workers idle
+    all_archives.sort(key=lambda a: a.stat().st_size, reverse=True)
 
-            # Post-Processing: Move or Delete archive
-            try:
-                with extraction_lock:
-                    if delete_after:
-                        archive_path.unlink()
-                        print(f"  [Post] Deleted archive: {archive_path.name}")
-                        return True, local_detected, (archive_path, None)
-                    else:
-                        processed_dir = target_root / ".processed"
-                        os.makedirs(processed_dir, exist_ok=True)
-
-                        destination = processed_dir / archive_path.name
-                        if destination.exists():
-                            timestamp = int(time.time() * 1000)
-                            destination = processed_dir / f"{archive_path.stem}_{timestamp}{archive_path.suffix}"
-
-                        # Double check archive still exists
-                        if not archive_path.exists():
-                            return True, local_detected, None
-
-                        shutil.move(str(archive_path), str(destination))
-                        return True, local_detected, (archive_path, destination)
-            except Exception as e:
-                print(f"  Warning: Move/Delete failed for {archive_path.name}: {e}")
-                return True, local_detected, None
-
-        except Exception as e:
-            print(f"  Error processing {archive_path.name}: {e}")
-            return False, None, None
-
-    # Run Parallel
-    max_workers = min(4, len(all_archives))
+    # Run Parallel (processes, since tar/zip member handling is GIL-bound Python)
+    max_workers = min(os.cpu_count() or 1, len(all_archives))
+    # Cores left over when there are fewer archives than cores go to parallel gzip decoding
+    decode_threads = max(1, (os.cpu_count() or 1) // len(all_archives))
     print(f"Starting extraction of {len(all_archives)} archives...")
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(process_archive, a) for a in all_archives]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(process_archive, a, target_root, platform_filter, decode_threads): a for a in all_archives
+        }
         for future in as_completed(futures):
-            success, platforms, move_info = future.result()
+            success, platforms = future.result()
+            # A partly extracted archive still reports its platforms so its data is ingested
+            if platforms:
+                detected_platforms.update(platforms)
             if success:
                 processed += 1
-                if platforms:
-                    detected_platforms.update(platforms)
+                # Archives are retired here, serially, so workers never coordinate
+                move_info = retire_archive(futures[future], target_root, delete_after)
                 if move_info:
                     archive_moves.append(move_info)
 
-    # Post-Extraction Structural Cleanup (Sequential)
-    # Google Voice
-    if "google_voice" in detected_platforms:
-        src = target_root / "Takeout" / "Voice"
-        dst = target_root / "Voice"
-        if src.exists():
-            print("  Consolidating Google Voice data...")
-            merge_folders(src, dst)
-
-    # Google Chat
-    if "google_chat" in detected_platforms:
-        src = target_root / "Takeout" / "Google Chat"
-        dst = target_root / "Google Chat"
-        if src.exists():
-            print("  Consolidating Google Chat data...")
-            merge_folders(src, dst)
-
-    # Google Mail
-    if "google_mail" in detected_platforms:
-        src = target_root / "Takeout" / "Mail"
-        dst = target_root / "Mail"
-        if src.exists():
-            print("  Consolidating Google Mail data...")
-            merge_folders(src, dst)
+    # Post-Extraction Structural Cleanup
+    # New archives are already flattened during extraction; this picks up Takeout folders left by
+    # older runs. Each product lives in its own subtree, so the merges can run concurrently.
+    merges = []
+    for platform, folder, label in TAKEOUT_PRODUCTS:
+        src = target_root / "Takeout" / folder
+        if platform in detected_platforms and src.exists():
+            print(f"  Consolidating {label} data...")
+            merges.append((src, target_root / folder))
+
+    if merges:
+        with ThreadPoolExecutor(max_workers=len(merges)) as executor:
+            list(executor.map(lambda m: merge_folders(*m), merges))
 
     # Final cleanup: remove empty Takeout folder
     takeout_root = target_root / "Takeout"
@@ -1,9 +1,9 @@
-import json
 import sqlite3
 from pathlib import Path
 
 # Local parser imports
 from parsers.google_mail import discover_google_mail_identity
+from utils import dump_json
 
 # --- Schema Definition ---
 SCHEMA_SQL = """
@@ -49,20 +49,6 @@ CREATE VIRTUAL TABLE IF NOT EXISTS content_fts USING fts5(
     tokenize='trigram'
 );
 
--- Triggers to keep FTS index in sync
-CREATE TRIGGER IF NOT EXISTS content_ai AFTER INSERT ON content BEGIN
-    INSERT INTO content_fts(rowid, content) VALUES (new.id, new.content);
-END;
-
-CREATE TRIGGER IF NOT EXISTS content_ad AFTER DELETE ON content BEGIN
-    INSERT INTO content_fts(content_fts, rowid, content) VALUES('delete', old.id, old.content);
-END;
-
-CREATE TRIGGER IF NOT EXISTS content_au AFTER UPDATE ON content BEGIN
-    INSERT INTO content_fts(content_fts, rowid, content) VALUES('delete', old.id, old.content);
-    INSERT INTO content_fts(rowid, content) VALUES (new.id, new.content);
-END;
-
 CREATE TABLE IF NOT EXISTS identities (
     platform TEXT,
     id_type TEXT, -- 'email', 'name', 'id'
@@ -71,17 +57,56 @@ CREATE TABLE IF NOT EXISTS identities (
     metadata_json TEXT, -- Optional: extra names, counts, etc.
     PRIMARY KEY (platform, id_type, id_value)
 );
+"""
 
+# Secondary indexes serve the webapp's reads; ingestion drops them and builds them after loading
+INDEXES_SQL = """
 CREATE INDEX IF NOT EXISTS idx_content_thread_id ON content(thread_id);
 CREATE INDEX IF NOT EXISTS idx_content_timestamp ON content(timestamp_ms);
 CREATE INDEX IF NOT EXISTS idx_content_sender_name ON content(sender_name);
 CREATE INDEX IF NOT EXISTS idx_threads_platform ON threads(platform);
 """
+SECONDARY_INDEXES = (
+    "idx_content_thread_id",
+    "idx_content_timestamp",
+    "idx_content_sender_name",
+    "idx_threads_platform",
+)
+
+# Triggers to keep FTS index in sync
+FTS_TRIGGERS_SQL = """
+CREATE TRIGGER IF NOT EXISTS content_ai AFTER INSERT ON content BEGIN
+    INSERT INTO content_fts(rowid, content) VALUES (new.id, new.content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS content_ad AFTER DELETE ON content BEGIN
+    INSERT INTO content_fts(content_fts, rowid, content) VALUES('delete', old.id, old.content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS content_au AFTER UPDATE ON content BEGIN
+    INSERT INTO content_fts(content_fts, rowid, content) VALUES('delete', old.id, old.content);
+    INSERT INTO content_fts(rowid, content) VALUES (new.id, new.content);
+END;
+"""
+FTS_TRIGGERS = ("content_ai", "content_ad", "content_au")
+
+
+# Ingestion is a bulk, re-runnable load, so trade per-commit fsyncs (synchronous=FULL)
+# for WAL + NORMAL and give SQLite a larger page cache and in-memory temp storage.
+CONNECTION_PRAGMAS = """
+PRAGMA foreign_keys = ON;
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+PRAGMA temp_store = MEMORY;
+PRAGMA cache_size = -65536;
+PRAGMA mmap_size = 268435456;
+"""
 
 
 def get_db_connection(db_path):
-    conn = sqlite3.connect(db_path)
-    conn.execute("PRAGMA foreign_keys = ON;")
+    # Room for every parser's statements so none are re-prepared over a long ingest
+    conn = sqlite3.connect(db_path, cached_statements=256)
+    conn.executescript(CONNECTION_PRAGMAS)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -92,20 +117,77 @@ def init_db(db_path):
 
     conn = get_db_connection(db_path)
     conn.executescript(SCHEMA_SQL)
+    conn.executescript(FTS_TRIGGERS_SQL)
+    conn.executescript(INDEXES_SQL)
     conn.commit()
     conn.close()
     print(f"Database initialized at {db_path}")
 
 
+def suspend_fts_sync(conn):
+    """
+    Drops the FTS sync triggers so bulk inserts skip per-row trigram indexing.
+    Must be paired with rebuild_fts(); init_db() also recreates the triggers.
+    """
+    for trigger in FTS_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+
+def rebuild_fts(conn):
+    """Repopulates content_fts from content in a single pass and restores the sync triggers."""
+    conn.execute("INSERT INTO content_fts(content_fts) VALUES('rebuild')")
+    conn.executescript(FTS_TRIGGERS_SQL)
+
+
+def drop_secondary_indexes(conn):
+    """
+    Drops the secondary indexes so bulk inserts only maintain the primary key and UNIQUE dedup index.
+    Must be paired with build_secondary_indexes(); init_db() also recreates them.
+    """
+    for index in SECONDARY_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {index}")
+
+
+def build_secondary_indexes(conn):
+    """Creates the secondary indexes over the loaded tables and refreshes planner statistics."""
+    conn.executescript(INDEXES_SQL)
+    conn.executescript("PRAGMA analysis_limit = 1000; ANALYZE;")
+
+
+def insert_rows(cursor, sql, rows):
+    """
+    Runs an INSERT OR IGNORE statement over rows in one batch; returns (inserted, skipped).
+    Ignored duplicates are not counted in rowcount, so they make up the difference.
+    """
+    if not rows:
+        return 0, 0
+    cursor.executemany(sql, rows)
+    return cursor.rowcount, len(rows) - cursor.rowcount
+
+
 def save_identity(cursor, platform, id_type, id_value, is_me=False, metadata=None):
-    """Inserts or updates an identity record safely."""
+    """
+    Inserts or updates an identity record safely.
+    Existing rows are only rewritten when a value changed (REPLACE would delete and reinsert every time).
+    """
+    is_me = 1 if is_me else 0
+    metadata_json = dump_json(metadata) if metadata else None
     cursor.execute(
         """
-        INSERT OR REPLACE INTO identities (platform, id_type, id_value, is_me, metadata_json)
+        INSERT OR IGNORE INTO identities (platform, id_type, id_value, is_me, metadata_json)
         VALUES (?, ?, ?, ?, ?)
         """,
-        (platform, id_type, id_value, 1 if is_me else 0, json.dumps(metadata) if metadata else None),
+        (platform, id_type, id_value, is_me, metadata_json),
     )
+    if cursor.rowcount == 0:
+        cursor.execute(
+            """
+            UPDATE identities SET is_me = ?, metadata_json = ?
+            WHERE platform = ? AND id_type = ? AND id_value = ?
+            AND (is_me IS NOT ? OR metadata_json IS NOT ?)
+            """,
+            (is_me, metadata_json, platform, id_type, id_value, is_me, metadata_json),
+        )
 
 
 def finalize_gmail_identity(cursor, gmail_identity_stats):
@@ -1,10 +1,20 @@
 import hashlib
-import json
+import os
 import sys
 import traceback
 from pathlib import Path
 
-from utils import fix_text, get_media_type
+from lib.db_ops import insert_rows
+from utils import dump_json, fix_name, fix_text, get_media_type, load_json
+
+INSERT_MESSAGE_SQL = """
+INSERT OR IGNORE INTO content
+(thread_id, sender_name, timestamp_ms, content, media_json, reactions_json, share_json)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Message attachment lists with a fixed media type; "files" are typed by extension
+MEDIA_KINDS = (("photos", "photo"), ("videos", "video"), ("gifs", "gif"), ("audio_files", "audio"))
 
 
 def get_stable_id(title):
@@ -13,7 +23,7 @@ def get_stable_id(title):
 
 def normalize_participants(participant_list):
     """Normalizes participant names for consistent ID generation."""
-    clean = [fix_text(p).strip() for p in participant_list if p]
+    clean = [fix_name(p).strip() for p in participant_list if p]
     return sorted(list(set(clean)))
 
 
@@ -31,131 +41,146 @@ def ingest_facebook_instagram_thread(cursor, thread_dir, platform, thread_id_ove
     Ingests a single Facebook or Instagram thread folder.
     This logic is shared because the JSON export structure is nearly identical for both.
     """
+    thread = parse_facebook_instagram_thread(thread_dir, platform, thread_id_override)
+    return write_facebook_instagram_thread(cursor, thread)
+
+
+def parse_facebook_instagram_thread(thread_dir, platform, thread_id_override=None):
+    """
+    Reads a Facebook or Instagram thread folder for write_facebook_instagram_thread.
+    Returns None if the folder has no message files.
+    """
     thread_path = Path(thread_dir)
     thread_id = thread_id_override if thread_id_override else thread_path.name
 
     # Collect all message json files
     # pattern: message_1.json, message_2.json ...
-    message_files = sorted(thread_path.glob("message_*.json"))
+    try:
+        with os.scandir(thread_path) as it:
+            message_files = sorted(
+                Path(e.path) for e in it if e.name.startswith("message_") and e.name.endswith(".json")
+            )
+    except OSError:
+        # Unreadable or vanished folder: skip the thread rather than fail the worker (and the scan)
+        return None
     if not message_files:
-        return 0, 0
+        return None
 
     # Parse Metadata (Title, Participants) from the first file (usually newest)
     title = ""
     participants = []
+    # Files parsed here are reused by the message pass instead of being decoded twice
+    parsed_files = {}
 
     for mf in message_files:
         try:
-            with mf.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-                if "title" in data and not title:
-                    title = fix_text(data["title"])
-                if "participants" in data and not participants:
-                    participants = [fix_text(p["name"]) for p in data["participants"] if "name" in p]
-                if title and participants:
-                    break
+            data = load_json(mf)
+            parsed_files[mf] = data
+            if "title" in data and not title:
+                title = fix_text(data["title"])
+            if "participants" in data and not participants:
+                participants = [fix_name(p["name"]) for p in data["participants"] if "name" in p]
+            if title and participants:
+                break
         except Exception:
             continue
 
-    participants_json = json.dumps(normalize_participants(participants))
-    is_group = len(participants) > 2
+    last_activity_ms = 0
+    latest_snippet = ""
+    rows = []
+
+    # Collect Messages
+    for mf in message_files:
+        try:
+            data = parsed_files.pop(mf, None) or load_json(mf)
+            messages = data.get("messages", [])
+
+            for m in messages:
+                sender = fix_name(m.get("sender_name", "Unknown"))
+                ts = m.get("timestamp_ms", 0)
+                content = fix_text(m.get("content"))
+
+                # Media
+                media = []
+                for key, media_type in MEDIA_KINDS:
+                    for x in m.get(key) or ():
+                        media.append({"uri": x.get("uri"), "type": media_type})
+                for x in m.get("files") or ():
+                    media.append({"uri": x.get("uri"), "type": get_media_type(x.get("uri"))})
+                if "sticker" in m:
+                    s = m["sticker"]
+                    if isinstance(s, dict) and "uri" in s:
+                        media.append({"uri": s["uri"], "type": "sticker"})
+
+                media_json = dump_json(media) if media else None
+
+                # Reactions
+                reactions = []
+                if "reactions" in m:
+                    reactions = [
+                        {"reaction": fix_name(r.get("reaction")), "actor": fix_name(r.get("actor"))}
+                        for r in m["reactions"]
+                    ]
+                reactions_json = dump_json(reactions) if reactions else None
+
+                # Share
+                share_json = None
+                if "share" in m:
+                    share_data = m["share"]
+                    if "share_text" in share_data:
+                        share_data["share_text"] = fix_text(share_data["share_text"])
+                    share_json = dump_json(share_data)
+
+                rows.append((thread_id, sender, ts, content, media_json, reactions_json, share_json))
+
+                if ts >= last_activity_ms:
+                    last_activity_ms = ts
+                    if content:
+                        latest_snippet = f"{sender}: {content}"
+                    elif media:
+                        latest_snippet = f"{sender} sent a {media[0]['type']}"
+                    else:
+                        latest_snippet = f"{sender} sent a message"
+
+        except Exception as e:
+            print(f"Error reading {mf}: {e}")
+
+    return {
+        "id": thread_id,
+        "platform": platform,
+        "title": title,
+        "participants_json": dump_json(normalize_participants(participants)),
+        "is_group": len(participants) > 2,
+        "rows": rows,
+        "last_activity_ms": last_activity_ms,
+        "snippet": latest_snippet,
+    }
+
+
+def write_facebook_instagram_thread(cursor, thread):
+    """Writes a thread produced by parse_facebook_instagram_thread; returns (inserted, skipped)."""
+    if thread is None:
+        return 0, 0
 
+    thread_id = thread["id"]
     cursor.execute(
         """
         INSERT OR REPLACE INTO threads (id, platform, title, participants_json, is_group)
         VALUES (?, ?, ?, ?, ?)
         """,
-        (thread_id, platform, title, participants_json, is_group),
+        (thread_id, thread["platform"], thread["title"], thread["participants_json"], thread["is_group"]),
     )
 
     # Insert label
     cursor.execute("INSERT OR IGNORE INTO thread_labels (thread_id, label) VALUES (?, ?)", (thread_id, "message"))
 
-    msg_count = 0
-    skipped_count = 0
-    last_activity_ms = 0
-    latest_snippet = ""
-
-    # Insert Messages
-    for mf in message_files:
-        try:
-            with mf.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-                messages = data.get("messages", [])
-
-                for m in messages:
-                    sender = fix_text(m.get("sender_name", "Unknown"))
-                    ts = m.get("timestamp_ms", 0)
-                    content = fix_text(m.get("content"))
-
-                    # Media
-                    media = []
-                    if "photos" in m:
-                        media.extend([{"uri": x.get("uri"), "type": "photo"} for x in m["photos"]])
-                    if "videos" in m:
-                        media.extend([{"uri": x.get("uri"), "type": "video"} for x in m["videos"]])
-                    if "gifs" in m:
-                        media.extend([{"uri": x.get("uri"), "type": "gif"} for x in m["gifs"]])
-                    if "audio_files" in m:
-                        media.extend([{"uri": x.get("uri"), "type": "audio"} for x in m["audio_files"]])
-                    if "files" in m:
-                        media.extend([{"uri": x.get("uri"), "type": get_media_type(x.get("uri"))} for x in m["files"]])
-                    if "sticker" in m:
-                        s = m["sticker"]
-                        if isinstance(s, dict) and "uri" in s:
-                            media.append({"uri": s["uri"], "type": "sticker"})
-
-                    media_json = json.dumps(media) if media else None
-
-                    # Reactions
-                    reactions = []
-                    if "reactions" in m:
-                        reactions = [
-                            {"reaction": fix_text(r.get("reaction")), "actor": fix_text(r.get("actor"))}
-                            for r in m["reactions"]
-                        ]
-                    reactions_json = json.dumps(reactions) if reactions else None
-
-                    # Share
-                    share_json = None
-                    if "share" in m:
-                        share_data = m["share"]
-                        if "share_text" in share_data:
-                            share_data["share_text"] = fix_text(share_data["share_text"])
-                        share_json = json.dumps(share_data)
-
-                    # INSERT
-                    cursor.execute(
-                        """
-                        INSERT OR IGNORE INTO content 
-                        (thread_id, sender_name, timestamp_ms, content, media_json, reactions_json, share_json)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                        """,
-                        (thread_id, sender, ts, content, media_json, reactions_json, share_json),
-                    )
-
-                    if cursor.rowcount > 0:
-                        msg_count += 1
-                    else:
-                        skipped_count += 1
-
-                    if ts >= last_activity_ms:
-                        last_activity_ms = ts
-                        if content:
-                            latest_snippet = f"{sender}: {content}"
-                        elif media:
-                            latest_snippet = f"{sender} sent a {media[0]['type']}"
-                        else:
-                            latest_snippet = f"{sender} sent a message"
-
-        except Exception as e:
-            print(f"Error reading {mf}: {e}")
+    msg_count, skipped_count = insert_rows(cursor, INSERT_MESSAGE_SQL, thread["rows"])
 
     # Update thread with metadata
-    if last_activity_ms > 0:
+    if thread["last_activity_ms"] > 0:
         cursor.execute(
             "UPDATE threads SET last_activity_ms = ?, snippet = ? WHERE id = ?",
-            (last_activity_ms, latest_snippet, thread_id),
+            (thread["last_activity_ms"], thread["snippet"], thread_id),
         )
 
     return msg_count, skipped_count
@@ -187,17 +212,16 @@ def ingest_facebook_events(cursor, scan_path, my_name):
 
         for ef in event_files:
             try:
-                with ef.open("r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    resp_v2 = data.get("event_responses_v2", {})
-                    for cat_key, status_msg, snippet in categories:
-                        events = resp_v2.get(cat_key, [])
-                        for ev in events:
-                            title = fix_text(ev.get("name", "Unknown Event"))
-                            ts_ms = ev.get("start_timestamp", 0) * 1000
-
-                            if ts_ms not in merged_events:
-                                merged_events[ts_ms] = {"title": title, "status_msg": status_msg, "snippet": snippet}
+                data = load_json(ef)
+                resp_v2 = data.get("event_responses_v2", {})
+                for cat_key, status_msg, snippet in categories:
+                    events = resp_v2.get(cat_key, [])
+                    for ev in events:
+                        title = fix_text(ev.get("name", "Unknown Event"))
+                        ts_ms = ev.get("start_timestamp", 0) * 1000
+
+                        if ts_ms not in merged_events:
+                            merged_events[ts_ms] = {"title": title, "status_msg": status_msg, "snippet": snippet}
             except Exception as e:
                 print(f"  [Warning] Failed to read {ef.name}: {e}")
 
@@ -256,13 +280,12 @@ def ingest_facebook_owned_events(cursor, scan_path, my_name):
         merged_events = {}
         for ef in event_files:
             try:
-                with ef.open("r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    events = data.get("your_events_v2", [])
-                    for ev in events:
-                        ts_ms = ev.get("start_timestamp", 0) * 1000
-                        if ts_ms not in merged_events:
-                            merged_events[ts_ms] = ev
+                data = load_json(ef)
+                events = data.get("your_events_v2", [])
+                for ev in events:
+                    ts_ms = ev.get("start_timestamp", 0) * 1000
+                    if ts_ms not in merged_events:
+                        merged_events[ts_ms] = ev
             except Exception as e:
                 print(f"  [Warning] Failed to read {ef.name}: {e}")
 
@@ -279,7 +302,7 @@ def ingest_facebook_owned_events(cursor, scan_path, my_name):
             if description:
                 event_metadata["description"] = description
 
-            share_json = json.dumps(event_metadata) if event_metadata else None
+            share_json = dump_json(event_metadata) if event_metadata else None
 
             # Create Thread
             cursor.execute(
@@ -332,23 +355,22 @@ def ingest_facebook_posts(cursor, scan_path, my_name):
     try:
         for p_file in posts_files:
             try:
-                with p_file.open("r", encoding="utf-8") as f:
-                    raw_posts = json.load(f)
-                    for post in raw_posts:
-                        ts = post.get("timestamp", 0)
-                        if ts not in merged_data:
-                            merged_data[ts] = post
-                        else:
-                            # Merge into existing timestamp
-                            # Prefer longer/more descriptive title
-                            new_title = post.get("title", "")
-                            old_title = merged_data[ts].get("title", "")
-                            if len(new_title) > len(old_title):
-                                merged_data[ts]["title"] = new_title
-
-                            # Merge data and attachments
-                            merged_data[ts].setdefault("data", []).extend(post.get("data", []))
-                            merged_data[ts].setdefault("attachments", []).extend(post.get("attachments", []))
+                raw_posts = load_json(p_file)
+                for post in raw_posts:
+                    ts = post.get("timestamp", 0)
+                    if ts not in merged_data:
+                        merged_data[ts] = post
+                    else:
+                        # Merge into existing timestamp
+                        # Prefer longer/more descriptive title
+                        new_title = post.get("title", "")
+                        old_title = merged_data[ts].get("title", "")
+                        if len(new_title) > len(old_title):
+                            merged_data[ts]["title"] = new_title
+
+                        # Merge data and attachments
+                        merged_data[ts].setdefault("data", []).extend(post.get("data", []))
+                        merged_data[ts].setdefault("attachments", []).extend(post.get("attachments", []))
             except Exception as e:
                 print(f"  [Warning] Failed to read {p_file.name}: {e}")
 
@@ -397,8 +419,8 @@ def ingest_facebook_posts(cursor, scan_path, my_name):
                     unique_media.append(m)
                     seen_uris.add(m["uri"])
 
-            media_json = json.dumps(unique_media) if unique_media else None
-            share_json = json.dumps({"link": share_url}) if share_url else None
+            media_json = dump_json(unique_media) if unique_media else None
+            share_json = dump_json({"link": share_url}) if share_url else None
 
             # Determine snippet and final message content
             # If we have content text, use it.
@@ -458,62 +480,59 @@ def ingest_facebook_checkins(cursor, scan_path, my_name):
     skipped_count = 0
 
     try:
-        with p.open("r", encoding="utf-8") as f:
-            checkins = json.load(f)
-
-            # Deduplicate by timestamp
-            merged_checkins = {}
-            for ci in checkins:
-                ts = ci.get("timestamp", 0)
-                if ts not in merged_checkins:
-                    merged_checkins[ts] = ci
-
-            for ts, ci in merged_checkins.items():
-                ts_ms = ts * 1000
-
-                # Extract location name from label_values
-                location_name = "Check-in"
-                labels = ci.get("label_values", [])
-                message = ""
-                for label_item in labels:
-                    if label_item.get("label") == "Place tags":
-                        d_list = label_item.get("dict", [])
-                        for d in d_list:
-                            if d.get("label") == "Name":
-                                location_name = fix_text(d.get("value", ""))
-                    if label_item.get("label") == "Message":
-                        message = fix_text(label_item.get("value", ""))
-
-                title = f"Checked in at {location_name}"
-                ci_id = f"fb_ci_{ts_ms}"
-
-                # Create Thread
-                cursor.execute(
-                    """
-                    INSERT OR REPLACE INTO threads (id, platform, title, last_activity_ms, snippet)
-                    VALUES (?, 'facebook', ?, ?, ?)
-                    """,
-                    (ci_id, title, ts_ms, message or title),
-                )
-
-                # Insert label
-                cursor.execute(
-                    "INSERT OR IGNORE INTO thread_labels (thread_id, label) VALUES (?, ?)", (ci_id, "checkin")
-                )
-
-                # Create Message
-                cursor.execute(
-                    """
-                    INSERT OR REPLACE INTO content (thread_id, sender_name, timestamp_ms, content)
-                    VALUES (?, ?, ?, ?)
-                    """,
-                    (ci_id, my_name or "Me", ts_ms, message or title),
-                )
-
-                if cursor.rowcount > 0:
-                    msg_count += 1
-                else:
-                    skipped_count += 1
+        checkins = load_json(p)
+
+        # Deduplicate by timestamp
+        merged_checkins = {}
+        for ci in checkins:
+            ts = ci.get("timestamp", 0)
+            if ts not in merged_checkins:
+                merged_checkins[ts] = ci
+
+        for ts, ci in merged_checkins.items():
+            ts_ms = ts * 1000
+
+            # Extract location name from label_values
+            location_name = "Check-in"
+            labels = ci.get("label_values", [])
+            message = ""
+            for label_item in labels:
+                if label_item.get("label") == "Place tags":
+                    d_list = label_item.get("dict", [])
+                    for d in d_list:
+                        if d.get("label") == "Name":
+                            location_name = fix_text(d.get("value", ""))
+                if label_item.get("label") == "Message":
+                    message = fix_text(label_item.get("value", ""))
+
+            title = f"Checked in at {location_name}"
+            ci_id = f"fb_ci_{ts_ms}"
+
+            # Create Thread
+            cursor.execute(
+                """
+                INSERT OR REPLACE INTO threads (id, platform, title, last_activity_ms, snippet)
+                VALUES (?, 'facebook', ?, ?, ?)
+                """,
+                (ci_id, title, ts_ms, message or title),
+            )
+
+            # Insert label
+            cursor.execute("INSERT OR IGNORE INTO thread_labels (thread_id, label) VALUES (?, ?)", (ci_id, "checkin"))
+
+            # Create Message
+            cursor.execute(
+                """
+                INSERT OR REPLACE INTO content (thread_id, sender_name, timestamp_ms, content)
+                VALUES (?, ?, ?, ?)
+                """,
+                (ci_id, my_name or "Me", ts_ms, message or title),
+            )
+
+            if cursor.rowcount > 0:
+                msg_count += 1
+            else:
+                skipped_count += 1
 
     except Exception as e:
         print(f"Error parsing check-ins: {e}")
@@ -529,11 +548,10 @@ def discover_facebook_identity(scan_path):
 
     if p.exists():
         try:
-            with p.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-                name = data.get("profile_v2", {}).get("name", {}).get("full_name")
-                if name:
-                    return name
+            data = load_json(p)
+            name = data.get("profile_v2", {}).get("name", {}).get("full_name")
+            if name:
+                return name
         except Exception as e:
             print(f"  [Error] Failed to parse Facebook identity file {p}: {e}", file=sys.stderr)
     return None
@@ -548,13 +566,12 @@ def discover_instagram_identity(scan_path):
 
     if p.exists():
         try:
-            with p.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-                profile_user = data.get("profile_user", [])
-                if profile_user:
-                    name = profile_user[0].get("string_map_data", {}).get("Name", {}).get("value")
-                    if name:
-                        return name
+            data = load_json(p)
+            profile_user = data.get("profile_user", [])
+            if profile_user:
+                name = profile_user[0].get("string_map_data", {}).get("Name", {}).get("value")
+                if name:
+                    return name
         except Exception as e:
             print(f"  [Error] Failed to parse Instagram identity file {p}: {e}", file=sys.stderr)
     return None
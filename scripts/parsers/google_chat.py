@@ -1,19 +1,34 @@
-import json
+import os
 import re
 import sys
 from pathlib import Path
 
-from utils import fix_text, get_media_type, parse_iso_time
+from lib.db_ops import insert_rows
+from utils import dump_json, fix_name, fix_text, get_media_type, load_json, parse_iso_time
+
+INSERT_MESSAGE_SQL = """
+INSERT OR IGNORE INTO content
+(thread_id, sender_name, timestamp_ms, content, media_json, reactions_json, share_json, annotations_json)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Duplicate attachment names on disk: "photo(1).jpg" -> stem "photo(1)"
+COPY_SUFFIX_RE = re.compile(r"(.*)\((\d+)\)$")
 
 
 def normalize_participants(participant_list):
     """Normalizes participant names for consistent ID generation."""
-    clean = [fix_text(p).strip() for p in participant_list if p]
+    clean = [fix_name(p).strip() for p in participant_list if p]
     return sorted(list(set(clean)))
 
 
 def ingest_google_chat_thread(cursor, thread_dir):
     """Ingests a single Google Chat thread folder."""
+    return write_google_chat_thread(cursor, parse_google_chat_thread(thread_dir))
+
+
+def parse_google_chat_thread(thread_dir):
+    """Reads a Google Chat thread folder into the dict consumed by write_google_chat_thread."""
     thread_path = Path(thread_dir)
     thread_id = thread_path.name
 
@@ -26,36 +41,21 @@ def ingest_google_chat_thread(cursor, thread_dir):
 
     if group_info_file.exists():
         try:
-            with group_info_file.open("r", encoding="utf-8") as f:
-                info = json.load(f)
-                title = info.get("name", "")
-                participants = [m.get("name", "Unknown") for m in info.get("members", [])]
+            info = load_json(group_info_file)
+            title = info.get("name", "")
+            participants = [m.get("name", "Unknown") for m in info.get("members", [])]
         except Exception:
             pass
 
-    participants_json = json.dumps(normalize_participants(participants))
+    participants_json = dump_json(normalize_participants(participants))
 
     # Determine if it's a group:
     # 1. Any 'Space' is a group
     # 2. Any DM with > 2 participants is a Group DM
     is_group = (not thread_id.startswith("DM ")) or (len(participants) > 2)
 
-    cursor.execute(
-        """
-        INSERT OR REPLACE INTO threads (id, platform, title, participants_json, is_group)
-        VALUES (?, ?, ?, ?, ?)
-        """,
-        (thread_id, "google_chat", title, participants_json, is_group),
-    )
-
-    # Insert labels
-    cursor.execute("INSERT OR IGNORE INTO thread_labels (thread_id, label) VALUES (?, 'message')", (thread_id,))
-    label = "group" if is_group else "dm"
-    cursor.execute("INSERT OR IGNORE INTO thread_labels (thread_id, label) VALUES (?, ?)", (thread_id, label))
-
     last_activity_ms = 0
     latest_snippet = ""
-    skipped_count = 0
 
     # Read Messages
     files_to_read = [messages_file] if messages_file.exists() else list(thread_path.glob("message_*.json"))
@@ -64,26 +64,25 @@ def ingest_google_chat_thread(cursor, thread_dir):
     # 1. Scan disk for actual files
     disk_file_map = {}  # { base_filename: [(index, actual_filename), ...] }
     try:
-        for f in thread_path.iterdir():
-            if not f.is_file():
-                continue
-            if f.name == "messages.json" or f.name.startswith("message_") or f.name == "group_info.json":
-                continue
-
-            name_part = f.stem
-            ext_part = f.suffix
-            match = re.search(r"^(.*)\((\d+)\)$", name_part)
-            if match:
-                base_root = match.group(1)
-                idx = int(match.group(2))
-                base_filename = base_root + ext_part
-            else:
-                base_filename = f.name
-                idx = 0
+        with os.scandir(thread_path) as it:
+            for entry in it:
+                name = entry.name
+                if name == "messages.json" or name.startswith("message_") or name == "group_info.json":
+                    continue
+                if not entry.is_file():
+                    continue
+
+                name_part, ext_part = os.path.splitext(name)
+                match = COPY_SUFFIX_RE.match(name_part)
+                if match:
+                    base_root = match.group(1)
+                    idx = int(match.group(2))
+                    base_filename = base_root + ext_part
+                else:
+                    base_filename = name
+                    idx = 0
 
-            if base_filename not in disk_file_map:
-                disk_file_map[base_filename] = []
-            disk_file_map[base_filename].append((idx, f.name))
+                disk_file_map.setdefault(base_filename, []).append((idx, name))
 
         for base in disk_file_map:
             disk_file_map[base].sort(key=lambda x: x[0])
@@ -95,10 +94,8 @@ def ingest_google_chat_thread(cursor, thread_dir):
     all_messages = []
     for mf in files_to_read:
         try:
-            with mf.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-                msgs = data.get("messages", [])
-                all_messages.extend(msgs)
+            data = load_json(mf)
+            all_messages.extend(data.get("messages", []))
         except Exception:
             pass
 
@@ -109,9 +106,7 @@ def ingest_google_chat_thread(cursor, thread_dir):
             for attachment in msg["attached_files"]:
                 ename = attachment.get("export_name")
                 if ename:
-                    if ename not in json_att_map:
-                        json_att_map[ename] = []
-                    json_att_map[ename].append(attachment)
+                    json_att_map.setdefault(ename, []).append(attachment)
 
     # 4. Resolve Filenames
     for ename, att_list in json_att_map.items():
@@ -137,7 +132,7 @@ def ingest_google_chat_thread(cursor, thread_dir):
                     att["export_name"] = ename.replace("?", "_")
 
     # Process messages
-    msg_count = 0
+    rows = []
     for m in all_messages:
         try:
             sender = m.get("creator", {}).get("name", "Unknown")
@@ -146,7 +141,7 @@ def ingest_google_chat_thread(cursor, thread_dir):
             content = fix_text(m.get("text", ""))
 
             annotations = m.get("annotations", [])
-            annotations_json = json.dumps(annotations) if annotations else None
+            annotations_json = dump_json(annotations) if annotations else None
 
             media = []
             if "attached_files" in m:
@@ -157,7 +152,7 @@ def ingest_google_chat_thread(cursor, thread_dir):
                         m_type = get_media_type(export_name)
                         media.append({"uri": uri, "type": m_type})
 
-            media_json = json.dumps(media) if media else None
+            media_json = dump_json(media) if media else None
 
             reactions = []
             if "reactions" in m:
@@ -165,25 +160,13 @@ def ingest_google_chat_thread(cursor, thread_dir):
                     emoji = r.get("emoji", {}).get("unicode", "")
                     for email in r.get("reactor_emails", []):
                         reactions.append({"reaction": emoji, "actor": email})
-            reactions_json = json.dumps(reactions) if reactions else None
+            reactions_json = dump_json(reactions) if reactions else None
 
             share_json = None
             if "quoted_message_metadata" in m:
-                share_json = json.dumps({"quoted_message": m["quoted_message_metadata"]})
-
-            cursor.execute(
-                """
-                INSERT OR IGNORE INTO content 
-                (thread_id, sender_name, timestamp_ms, content, media_json, reactions_json, share_json, annotations_json)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (thread_id, sender, ts, content, media_json, reactions_json, share_json, annotations_json),
-            )
-
-            if cursor.rowcount > 0:
-                msg_count += 1
-            else:
-                skipped_count += 1
+                share_json = dump_json({"quoted_message": m["quoted_message_metadata"]})
+
+            rows.append((thread_id, sender, ts, content, media_json, reactions_json, share_json, annotations_json))
 
             if ts >= last_activity_ms:
                 last_activity_ms = ts
@@ -197,10 +180,39 @@ def ingest_google_chat_thread(cursor, thread_dir):
         except Exception as e:
             print(f"Error processing message in {thread_dir}: {e}")
 
-    if last_activity_ms > 0:
+    return {
+        "id": thread_id,
+        "title": title,
+        "participants_json": participants_json,
+        "is_group": is_group,
+        "rows": rows,
+        "last_activity_ms": last_activity_ms,
+        "snippet": latest_snippet,
+    }
+
+
+def write_google_chat_thread(cursor, thread):
+    """Writes a thread produced by parse_google_chat_thread; returns (inserted, skipped)."""
+    thread_id = thread["id"]
+    cursor.execute(
+        """
+        INSERT OR REPLACE INTO threads (id, platform, title, participants_json, is_group)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (thread_id, "google_chat", thread["title"], thread["participants_json"], thread["is_group"]),
+    )
+
+    # Insert labels
+    cursor.execute("INSERT OR IGNORE INTO thread_labels (thread_id, label) VALUES (?, 'message')", (thread_id,))
+    label = "group" if thread["is_group"] else "dm"
+    cursor.execute("INSERT OR IGNORE INTO thread_labels (thread_id, label) VALUES (?, ?)", (thread_id, label))
+
+    msg_count, skipped_count = insert_rows(cursor, INSERT_MESSAGE_SQL, thread["rows"])
+
+    if thread["last_activity_ms"] > 0:
         cursor.execute(
             "UPDATE threads SET last_activity_ms = ?, snippet = ? WHERE id = ?",
-            (last_activity_ms, latest_snippet, thread_id),
+            (thread["last_activity_ms"], thread["snippet"], thread_id),
         )
 
     return msg_count, skipped_count
@@ -214,11 +226,10 @@ def discover_google_chat_identity(scan_path):
             for user_dir in root.glob("User *"):
                 info_file = user_dir / "user_info.json"
                 if info_file.exists():
-                    with info_file.open("r", encoding="utf-8") as f:
-                        data = json.load(f)
-                        name = data.get("user", {}).get("name")
-                        if name:
-                            return name
+                    data = load_json(info_file)
+                    name = data.get("user", {}).get("name")
+                    if name:
+                        return name
         except Exception as e:
             print(f"  [Error] Failed to parse Google Chat identity info: {e}", file=sys.stderr)
     return None
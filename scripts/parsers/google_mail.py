@@ -1,4 +1,3 @@
-import json
 import mailbox
 import re
 from email.header import decode_header
@@ -7,7 +6,14 @@ from pathlib import Path
 
 from bs4 import BeautifulSoup
 
-from utils import fix_text, get_media_type
+from utils import dump_json, fix_text, get_media_type
+
+# Runs once per message; a single module-level string keeps it in the connection's statement cache
+INSERT_MESSAGE_SQL = """
+INSERT OR IGNORE INTO content
+(thread_id, sender_name, timestamp_ms, content, media_json)
+VALUES (?, ?, ?, ?, ?)
+"""
 
 
 def get_body(msg):
@@ -441,15 +447,11 @@ def ingest_google_mail_mbox(cursor, mbox_path, identity_stats):
                 if not any(m["uri"] == ext_img["uri"] for m in media):
                     media.append(ext_img)
 
-            media_json = json.dumps(media) if media else None
+            media_json = dump_json(media) if media else None
 
             # 7. Insert Content
             cursor.execute(
-                """
-                INSERT OR IGNORE INTO content 
-                (thread_id, sender_name, timestamp_ms, content, media_json)
-                VALUES (?, ?, ?, ?, ?)
-                """,
+                INSERT_MESSAGE_SQL,
                 (thread_id, sender, ts, content, media_json),
             )
 
@@ -484,7 +486,7 @@ def ingest_google_mail_mbox(cursor, mbox_path, identity_stats):
     # Commit Threads and Labels
     print(f"Finishing {len(cache_threads)} threads...")
     for tid, info in cache_threads.items():
-        participants_json = json.dumps(info["participants"])
+        participants_json = dump_json(info["participants"])
         cursor.execute(
             """
             INSERT OR REPLACE INTO threads (id, platform, title, participants_json, is_group, last_activity_ms, snippet)
@@ -1,10 +1,17 @@
-import json
+import os
 import re
 from pathlib import Path
 
 from bs4 import BeautifulSoup
 
-from utils import fix_text, get_media_type, parse_iso_time
+from lib.db_ops import insert_rows
+from utils import dump_json, fix_name, fix_text, get_media_type, parse_ahead, parse_iso_time
+
+INSERT_MESSAGE_SQL = """
+INSERT OR IGNORE INTO content
+(thread_id, sender_name, timestamp_ms, content, media_json, reactions_json, share_json)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
 
 
 def ingest_google_voice_thread(cursor, thread_data):
@@ -12,6 +19,14 @@ def ingest_google_voice_thread(cursor, thread_data):
     Ingest a single Virtual Thread of Google Voice files.
     thread_data: tuple (thread_id, [list_of_html_paths])
     """
+    return write_google_voice_thread(cursor, parse_google_voice_thread(thread_data))
+
+
+def parse_google_voice_thread(thread_data):
+    """
+    Parses a Virtual Thread of Google Voice files for write_google_voice_thread.
+    thread_data: tuple (thread_id, [list_of_html_paths])
+    """
     thread_id, files = thread_data
 
     # Calculate thread title
@@ -20,14 +35,12 @@ def ingest_google_voice_thread(cursor, thread_data):
     # Determine participants
     # Me + The Other Person
     parts = ["Me", thread_id]
-    parts_json = json.dumps(parts)
-
-    msg_count = 0
-    skipped_count = 0
+    parts_json = dump_json(parts)
 
     # Track latest metadata for this thread
     last_activity_ms = 0
     latest_snippet = ""
+    rows = []
 
     for fpath in files:
         try:
@@ -122,7 +135,7 @@ def ingest_google_voice_thread(cursor, thread_data):
                     if "Received" in fpath.name or "Missed" in fpath.name:
                         sender = thread_id
 
-                sender = fix_text(sender)
+                sender = fix_name(sender)
 
                 # 3. Content
                 content_text = ""
@@ -180,22 +193,10 @@ def ingest_google_voice_thread(cursor, thread_data):
                         m_type = get_media_type(href)
                         media.append({"uri": rel_path, "type": m_type})
 
-                media_json = json.dumps(media) if media else None
+                media_json = dump_json(media) if media else None
 
-                # 5. Insert
-                cursor.execute(
-                    """
-                    INSERT OR IGNORE INTO content 
-                    (thread_id, sender_name, timestamp_ms, content, media_json, reactions_json, share_json)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (thread_id, sender, ts, content_text, media_json, None, None),
-                )
-
-                if cursor.rowcount > 0:
-                    msg_count += 1
-                else:
-                    skipped_count += 1
+                # 5. Queue for insert
+                rows.append((thread_id, sender, ts, content_text, media_json, None, None))
 
                 # Metadata update
                 if ts >= last_activity_ms:
@@ -210,6 +211,20 @@ def ingest_google_voice_thread(cursor, thread_data):
         except Exception as e:
             print(f"Error processing GV file {fpath}: {e}")
 
+    return {
+        "id": thread_id,
+        "participants_json": parts_json,
+        "rows": rows,
+        "last_activity_ms": last_activity_ms,
+        "snippet": latest_snippet,
+    }
+
+
+def write_google_voice_thread(cursor, thread):
+    """Writes a thread produced by parse_google_voice_thread; returns (inserted, skipped)."""
+    thread_id = thread["id"]
+    msg_count, skipped_count = insert_rows(cursor, INSERT_MESSAGE_SQL, thread["rows"])
+
     # Update Thread Metadata
     if msg_count > 0:
         # Insert thread only if we actually ingested messages to avoid empty stubs
@@ -218,7 +233,7 @@ def ingest_google_voice_thread(cursor, thread_data):
             INSERT OR REPLACE INTO threads (id, platform, title, participants_json, last_activity_ms, snippet)
             VALUES (?, 'google_voice', ?, ?, ?, ?)
             """,
-            (thread_id, thread_id, parts_json, last_activity_ms, latest_snippet),
+            (thread_id, thread_id, thread["participants_json"], thread["last_activity_ms"], thread["snippet"]),
         )
 
         # Insert label
@@ -227,10 +242,11 @@ def ingest_google_voice_thread(cursor, thread_data):
     return msg_count, skipped_count
 
 
-def ingest_google_voice(cursor, voice_root):
+def ingest_google_voice(cursor, voice_root, executor=None):
     """
     Scans the Google Voice directory structure and ingests messages.
     Virtualizes 'Threads' by grouping filenames by the mentioned phone number.
+    When an executor is given, threads are parsed on it and only written here.
     """
 
     calls_dir = Path(voice_root) / "Calls"
@@ -246,9 +262,13 @@ def ingest_google_voice(cursor, voice_root):
     re_fname = re.compile(r"^(.*?)\s+-\s+(Text|Voicemail|Placed|Received|Missed)")
     re_fname_anon = re.compile(r"^\s+-\s+(Text|Voicemail|Placed|Received|Missed)")
 
+    # Calls/ also holds every attachment, so filter on the dirent name before building Paths
+    with os.scandir(calls_dir) as it:
+        html_entries = [e for e in it if e.name.endswith(".html") and e.is_file()]
+
     count = 0
-    for f in calls_dir.glob("*.html"):
-        name = f.name
+    for entry in html_entries:
+        name = entry.name
         thread_id = "Unknown"
 
         match = re_fname.match(name)
@@ -267,7 +287,7 @@ def ingest_google_voice(cursor, voice_root):
 
         if thread_id not in file_groups:
             file_groups[thread_id] = []
-        file_groups[thread_id].append(f)
+        file_groups[thread_id].append(Path(entry.path))
         count += 1
 
     print(f"Found {count} Google Voice metadata files across {len(file_groups)} threads.")
@@ -278,8 +298,13 @@ def ingest_google_voice(cursor, voice_root):
     total_msgs = 0
     total_skipped = 0
 
-    for tid, files in file_groups.items():
-        m, s = ingest_google_voice_thread(cursor, (tid, files))
+    if executor is not None:
+        parsed_threads = parse_ahead(executor, [(parse_google_voice_thread, g) for g in file_groups.items()])
+    else:
+        parsed_threads = map(parse_google_voice_thread, file_groups.items())
+
+    for thread in parsed_threads:
+        m, s = write_google_voice_thread(cursor, thread)
         total_msgs += m
         total_skipped += s
         processed_threads += 1
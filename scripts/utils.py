@@ -1,7 +1,13 @@
+import functools
+import itertools
+import json
+import multiprocessing
 import os
 import re
 import shutil
 import stat
+from collections import deque
+from datetime import datetime, timezone
 from pathlib import Path, PureWindowsPath
 
 # External dependencies (assumes venv is active)
@@ -17,6 +23,12 @@ except ImportError:
     print("Error: 'python-dotenv' is required. Please install it via 'pip install -r scripts/requirements.txt'")
     exit(1)
 
+# Optional accelerators (fall back to the stdlib when missing)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # -----------------------------------------------------------------------------
 # Configuration & Path Resolution
 # -----------------------------------------------------------------------------
@@ -24,10 +36,14 @@ SCRIPT_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = SCRIPT_DIR.parent
 ENV_FILE = PROJECT_ROOT / ".env"
 
+# Parse workers re-import this module when processes are spawned; only the main process reports config
+IS_MAIN_PROCESS = multiprocessing.current_process().name == "MainProcess"
+
 # Load environment variables
 if ENV_FILE.exists():
     load_dotenv(ENV_FILE)
-    print(f"Loaded config from {ENV_FILE}")
+    if IS_MAIN_PROCESS:
+        print(f"Loaded config from {ENV_FILE}")
 
 
 def get_workspace_path():
@@ -61,12 +77,16 @@ def get_workspace_path():
 
 
 WORKSPACE_PATH = get_workspace_path()
-print(f"Using Workspace: {WORKSPACE_PATH}")
+if IS_MAIN_PROCESS:
+    print(f"Using Workspace: {WORKSPACE_PATH}")
 
 
 # -----------------------------------------------------------------------------
 # Text Utilities
 # -----------------------------------------------------------------------------
+_BARE_HEART_RE = re.compile(r"\u2764(?!\uFE0F)")
+
+
 def fix_text(text):
     """
     Fixes Latin-1 encoding issues common in Meta/Facebook/Instagram exports.
@@ -75,22 +95,110 @@ def fix_text(text):
     if not text:
         return ""
     try:
+        # ASCII round-trips unchanged (and has no heart), so only the strip applies
+        if text.isascii():
+            return text.strip()
         # Re-interpret bytes as UTF-8
         decoded = text.encode("latin1").decode("utf8")
         # Fix heart emoji (U+2764) to be followed by VS-16 (U+FE0F) if not already
-        decoded = re.sub(r"\u2764(?!\uFE0F)", "\u2764\ufe0f", decoded)
+        if "\u2764" in decoded:
+            decoded = _BARE_HEART_RE.sub("\u2764\ufe0f", decoded)
         return decoded.strip()
     except Exception:
         return text
 
 
+@functools.lru_cache(maxsize=65536)
+def fix_name(text):
+    """
+    fix_text for short values that repeat throughout a thread (sender names, reaction actors, emoji).
+    Message bodies are nearly all unique and should keep using fix_text directly.
+    """
+    return fix_text(text)
+
+
+def load_json(path):
+    """
+    Reads and parses a JSON file.
+    Uses orjson when available (several times faster on large Meta exports).
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # orjson is stricter than the stdlib (e.g. BOMs); let json decide
+            pass
+    return json.loads(raw)
+
+
+def dump_json(obj):
+    """
+    Serializes obj to a compact JSON string for storage in a TEXT column.
+    Uses orjson when available; non-ASCII text is stored as UTF-8 rather than ASCII escapes.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode("utf-8")
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits; let json handle it
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+_MONTHS = {
+    "January": 1,
+    "February": 2,
+    "March": 3,
+    "April": 4,
+    "May": 5,
+    "June": 6,
+    "July": 7,
+    "August": 8,
+    "September": 9,
+    "October": 10,
+    "November": 11,
+    "December": 12,
+}
+
+
+def parse_google_chat_time(date_str):
+    """
+    Fast path for Google Chat's fixed "Tuesday, February 20, 2024 at 02:00:00 PM UTC" format.
+    Returns milliseconds, or None if the string is in any other shape.
+    """
+    try:
+        _, month_day, rest = date_str.replace("\u202f", " ").split(", ", 2)
+        year, clock = rest.split(" at ", 1)
+        hms, meridiem, tz = clock.split(" ")
+        if tz != "UTC" or meridiem not in ("AM", "PM"):
+            return None
+
+        month_name, day = month_day.split(" ")
+        hour, minute, second = (int(x) for x in hms.split(":"))
+        hour = hour % 12 + (12 if meridiem == "PM" else 0)
+
+        dt = datetime(int(year), _MONTHS[month_name], int(day), hour, minute, second, tzinfo=timezone.utc)
+        return int(dt.timestamp() * 1000)
+    except (AttributeError, ValueError, KeyError):
+        return None
+
+
+@functools.lru_cache(maxsize=1 << 16)
 def parse_iso_time(iso_str):
     """
     Parses timestamps (Google Chat ISO, Google Voice ISO, etc) to milliseconds using dateutil.
+    Memoized: chat exports repeat the same per-second timestamp strings many times.
     """
     if not iso_str:
         return 0
 
+    ts = parse_google_chat_time(iso_str)
+    if ts is not None:
+        return ts
+
     try:
         # dateutil handles "Monday, May 20..." and "2023-01-01T..." automatically
         dt = parser.parse(iso_str)
@@ -99,6 +207,14 @@ def parse_iso_time(iso_str):
         return 0
 
 
+_MEDIA_TYPES_BY_EXT = {
+    **dict.fromkeys([".jpg", ".jpeg", ".png", ".webp", ".heic", ".bmp"], "photo"),
+    **dict.fromkeys([".mp4", ".mov", ".avi", ".mkv", ".webm"], "video"),
+    ".gif": "gif",
+    **dict.fromkeys([".mp3", ".wav", ".m4a", ".ogg", ".aac"], "audio"),
+}
+
+
 def get_media_type(filename, default="file"):
     """
     Determines MessageHub media type (photo, video, gif, audio) based on filename extension.
@@ -106,17 +222,8 @@ def get_media_type(filename, default="file"):
     if not filename:
         return default
 
-    ext = Path(filename).suffix.lower()
-    if ext in [".jpg", ".jpeg", ".png", ".webp", ".heic", ".bmp"]:
-        return "photo"
-    if ext in [".mp4", ".mov", ".avi", ".mkv", ".webm"]:
-        return "video"
-    if ext == ".gif":
-        return "gif"
-    if ext in [".mp3", ".wav", ".m4a", ".ogg", ".aac"]:
-        return "audio"
-
-    return default
+    ext = os.path.splitext(filename)[1].lower()
+    return _MEDIA_TYPES_BY_EXT.get(ext, default)
 
 
 def clean_json_messages(directory, platforms=None):
@@ -259,6 +366,45 @@ def clean_google_mail_files(data_dir=WORKSPACE_PATH):
     print(f"Google Mail Cleanup Complete. Deleted {deleted_count} files ({mb:.2f} MB).")
 
 
+def parse_ahead(executor, jobs, window=None):
+    """
+    Yields the results of (fn, *args) jobs in submission order, keeping at most `window`
+    (default: twice the CPU count) in flight so parsed data never piles up in memory
+    faster than the single DB writer drains it.
+    """
+    window = window or 2 * (os.cpu_count() or 1)
+    jobs = iter(jobs)
+    pending = deque(executor.submit(*job) for job in itertools.islice(jobs, window))
+    while pending:
+        future = pending.popleft()
+        job = next(jobs, None)
+        if job:
+            pending.append(executor.submit(*job))
+        yield future.result()
+
+
+def iter_files(root):
+    """
+    Yields the path of every file under root, relative to root.
+    Uses os.scandir with an explicit stack so the cached DirEntry type is reused
+    instead of stat'ing each entry again (as os.walk + Path checks would).
+    """
+    root = str(root)
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            with os.scandir(os.path.join(root, rel_dir)) as it:
+                for entry in it:
+                    rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(rel_path)
+                    else:
+                        yield rel_path
+        except OSError as e:
+            print(f"Warning: Could not scan {os.path.join(root, rel_dir)}: {e}")
+
+
 def merge_folders(src, dst):
     """
     Recursively merges src directory into dst directory with progress reporting.
@@ -270,10 +416,9 @@ def merge_folders(src, dst):
     if not src.exists():
         return
 
-    # Phase 1: Count total files (Discovery)
-    total_files = 0
-    for root, _, filenames in os.walk(src):
-        total_files += len(filenames)
+    # Phase 1: Collect relative file paths (Discovery)
+    rel_files = list(iter_files(src))
+    total_files = len(rel_files)
 
     if total_files == 0:
         # Just clean up the empty folder
@@ -287,35 +432,37 @@ def merge_folders(src, dst):
     current_count = 0
     folder_name = src.name
 
-    for root, dirs, filenames in os.walk(src):
-        rel_path = Path(root).relative_to(src)
-        target_dir = dst / rel_path
-        target_dir.mkdir(parents=True, exist_ok=True)
+    created_dirs = set()
 
-        for f in filenames:
-            src_file = Path(root) / f
-            dst_file = target_dir / f
+    for rel_file in rel_files:
+        src_file = src / rel_file
+        dst_file = dst / rel_file
 
-            # Move (fast on same drive)
-            try:
-                if dst_file.exists():
-                    try:
-                        dst_file.unlink()  # Overwrite if exists
-                    except Exception:
-                        pass
+        target_dir = dst_file.parent
+        if target_dir not in created_dirs:
+            target_dir.mkdir(parents=True, exist_ok=True)
+            created_dirs.add(target_dir)
 
-                shutil.move(str(src_file), str(dst_file))
-            except Exception:
-                # Fallback to copy if move fails (e.g. cross-device)
+        # Move (fast on same drive)
+        try:
+            if dst_file.exists():
                 try:
-                    shutil.copy2(str(src_file), str(dst_file))
-                    src_file.unlink()
-                except Exception as e2:
-                    print(f"Error merging file {src_file}: {e2}")
-
-            current_count += 1
-            if current_count % 100 == 0 or current_count == total_files:
-                print(f"[MergeProgress]: {folder_name}|{current_count}|{total_files}")
+                    dst_file.unlink()  # Overwrite if exists
+                except Exception:
+                    pass
+
+            shutil.move(str(src_file), str(dst_file))
+        except Exception:
+            # Fallback to copy if move fails (e.g. cross-device)
+            try:
+                shutil.copy2(str(src_file), str(dst_file))
+                src_file.unlink()
+            except Exception as e2:
+                print(f"Error merging file {src_file}: {e2}")
+
+        current_count += 1
+        if current_count % 100 == 0 or current_count == total_files:
+            print(f"[MergeProgress]: {folder_name}|{current_count}|{total_files}")
 
     # Phase 3: Cleanup empty directories
     def on_rm_error(func, path, exc_info):